@@ -1,15 +1,17 @@
 import pygame  # Import Pygame library for game development
 import random  # Import random module for randomizing collectibles and enemy actions
-
-# Initialize Pygame for graphics, events, and sound
-pygame.init()  # Initialize all Pygame modules
-pygame.mixer.init()  # Initialize Pygame's sound mixer for audio playback
+import argparse  # Import argparse for command-line options (seed, record, replay)
+import json  # Import json for serializing world-state snapshots
+import struct  # Import struct for packing the binary replay log
+import time  # Import time for measuring per-frame cost during replays
+import zlib  # Import zlib for compressing world-state snapshots
+import os  # Import os for resolving asset paths relative to this script
+import threading  # Import threading for loading assets in the background
+import functools  # Import functools for caching font lookups
 
 # Screen settings
 SCREEN_WIDTH = 800  # Define screen width as 800 pixels
 SCREEN_HEIGHT = 600  # Define screen height as 600 pixels
-screen = pygame.display.set_mode((SCREEN_WIDTH, SCREEN_HEIGHT))  # Create game window with specified dimensions
-pygame.display.set_caption("Tank Battle: Side-Scroller")  # Set the window title to "Tank Battle: Side-Scroller"
 
 # Colors (RGB and RGBA for transparency)
 WHITE = (255, 255, 255)  # Define white color as RGB (255, 255, 255)
@@ -34,14 +36,146 @@ LEVEL_GRADIENTS = [  # Define gradient colors for level backgrounds
     [(70, 130, 70), (120, 180, 120)]   # Set green gradient for level 3 (top: 70,130,70; bottom: 120,180,120)
 ]
 
-# Load sound effects (place .wav files in the same directory as this script)
-try:  # Begin try block to handle potential file loading errors
-    SHOOT_SOUND = pygame.mixer.Sound("shoot.wav")  # Load shooting sound effect from shoot.wav
-    COLLECT_SOUND = pygame.mixer.Sound("collect.wav")  # Load collectible pickup sound from collect.wav
-    DAMAGE_SOUND = pygame.mixer.Sound("damage.wav")  # Load damage sound effect from damage.wav
-except FileNotFoundError:  # Catch FileNotFoundError if sound files are missing
-    print("Sound files not found. Please add shoot.wav, collect.wav, and damage.wav to the game directory.")  # Print warning if sound files are not found
-    SHOOT_SOUND = COLLECT_SOUND = DAMAGE_SOUND = None  # Set sound variables to None to disable sound if files are missing
+# Asset manifest (sound files are looked up in the same directory as this script)
+ASSET_DIR = os.path.dirname(os.path.abspath(__file__))  # Resolve directory containing this script
+SOUND_MANIFEST = {  # Map sound category to (file name, reserved voices, base volume)
+    "shoot": ("shoot.wav", 4, 0.8),  # Reserve 4 voices for shooting sounds at 80% volume
+    "damage": ("damage.wav", 3, 1.0),  # Reserve 3 voices for damage sounds
+    "collect": ("collect.wav", 2, 1.0)  # Reserve 2 voices for collect sounds
+}
+FONT_MANIFEST = {  # Map font name to (system font family, point size, bold)
+    "ui": ("arial", 24, True),  # Font for UI text (24pt, bold)
+    "congrats": ("arial", 36, True)  # Larger font for final congratulation (36pt, bold)
+}
+
+# Replay settings
+REPLAY_MAGIC = b"TNKR"  # Magic bytes identifying a replay log file
+REPLAY_VERSION = 2  # Version number of the replay log format (2: JSON snapshots)
+SNAPSHOT_VERSION = 1  # Version number of the snapshot payload layout
+SNAPSHOT_INTERVAL = 300  # Take a world-state snapshot every 300 frames (5 seconds at 60 FPS) for fast seeking
+LEVEL_COMPLETE_FRAMES = 120  # Show level complete message for 120 frames (2 seconds at 60 FPS)
+HELD_KEYS = (pygame.K_LEFT, pygame.K_RIGHT, pygame.K_SPACE)  # Keys whose held state is recorded every frame (one bit each)
+EVENT_KEYS = (pygame.K_s, pygame.K_r)  # Keys whose KEYDOWN events are recorded (stored as index into this tuple)
+
+# Audio settings
+AUDIO_FALLOFF = 0.7  # Fraction of volume lost for a source at the screen edge (linear with distance from screen center)
+
+# AudioManager class to pool mixer channels per sound category and play at most one voice per category per frame
+class AudioManager:  # Define AudioManager class for cheap sound mixing in heavy combat
+    def __init__(self):  # Initialize audio manager with no categories
+        self.enabled = True  # Set sound enabled state (False mutes all triggers, used while seeking or fast-replaying)
+        self.reset()  # Start with no categories
+
+    def reset(self):  # Define method to forget all categories (their channels belong to a mixer that is gone)
+        self.categories = {}  # Initialize dictionary of category name to (sound, reserved channels, base volume)
+        self.pending = {}  # Initialize dictionary of category name to source x positions triggered this frame
+        self.num_channels = 0  # Set number of mixer channels reserved so far
+
+    def add_category(self, name, sound, voices, volume=1.0):  # Define method to reserve a channel group for a sound
+        if sound is None or not pygame.mixer.get_init():  # Check if sound or mixer is unavailable
+            return  # Leave category unregistered so its triggers are ignored
+        first = self.num_channels  # Remember first channel index of this group
+        self.num_channels += voices  # Count channels reserved for this group (caps simultaneous voices)
+        if pygame.mixer.get_num_channels() < self.num_channels:  # Check if mixer needs more channels
+            pygame.mixer.set_num_channels(self.num_channels)  # Allocate enough mixer channels
+        pygame.mixer.set_reserved(self.num_channels)  # Reserve group channels so other sounds cannot steal them
+        channels = [pygame.mixer.Channel(i) for i in range(first, self.num_channels)]  # Create channel objects for this group
+        self.categories[name] = (sound, channels, volume)  # Store category settings
+
+    def trigger(self, name, x):  # Define method to request a sound from a source at world x position
+        if self.enabled and name in self.categories:  # Check if sound is enabled and category is registered
+            self.pending.setdefault(name, []).append(x)  # Queue source position for this frame
+
+    def flush(self, camera):  # Define method to play queued sounds once per frame
+        center = camera.offset + SCREEN_WIDTH // 2  # Calculate world x of screen center (listener position)
+        half_width = SCREEN_WIDTH // 2  # Calculate distance from screen center to screen edge
+        for name, positions in self.pending.items():  # Iterate over categories triggered this frame
+            distance = min(abs(x - center) for x in positions)  # Coalesce duplicate triggers into the nearest source
+            if distance > half_width:  # Check if nearest source is off-screen
+                continue  # Skip playback for off-screen sources
+            sound, channels, volume = self.categories[name]  # Read category settings
+            channel = next((c for c in channels if not c.get_busy()), None)  # Find a free channel in the group
+            if channel is None:  # Check if all voices in the group are busy
+                continue  # Drop sound instead of cutting off a playing one
+            channel.play(sound)  # Play sound on the free channel
+            channel.set_volume(volume * (1 - AUDIO_FALLOFF * distance / half_width))  # Attenuate by distance from screen center
+        self.pending.clear()  # Clear triggers for next frame
+
+AUDIO = AudioManager()  # Create global audio manager (categories are added once sounds have loaded)
+
+# Initialize Pygame for graphics, events, and sound (called from main, so importing this script has no side effects)
+def init_engine():  # Define function to start Pygame and open the game window
+    AUDIO.reset()  # Drop channel groups left over from a previous engine session
+    pygame.init()  # Initialize all Pygame modules
+    try:  # Begin try block to handle missing audio device
+        pygame.mixer.init()  # Initialize Pygame's sound mixer for audio playback
+    except pygame.error:  # Catch error if no audio device is available
+        print("Audio device not available. Sound is disabled.")  # Print warning and continue without sound
+    screen = pygame.display.set_mode((SCREEN_WIDTH, SCREEN_HEIGHT))  # Create game window with specified dimensions
+    pygame.display.set_caption("Tank Battle: Side-Scroller")  # Set the window title to "Tank Battle: Side-Scroller"
+    return screen  # Return game window surface
+
+# Look up a system font once and reuse it (SysFont scans installed fonts, which is slow)
+@functools.lru_cache(maxsize=None)  # Cache fonts by family, size and weight
+def get_font(family, size, bold=False):  # Define function to get a cached font
+    return pygame.font.SysFont(family, size, bold=bold)  # Create font from system font family
+
+# Shut down Pygame and drop everything tied to the current engine session
+def shutdown_engine():  # Define function to quit Pygame safely
+    get_font.cache_clear()  # Drop cached fonts (they are invalid once Pygame quits)
+    AUDIO.reset()  # Drop channel groups of the mixer being shut down
+    pygame.quit()  # Quit Pygame
+
+# AssetLoader class to load sounds and fonts from the manifests in a background thread
+class AssetLoader:  # Define AssetLoader class for asynchronous asset loading
+    def __init__(self):  # Initialize loader with empty asset tables
+        self.sounds = {}  # Initialize dictionary of sound category to loaded sound
+        self.fonts = {}  # Initialize dictionary of font name to loaded font
+        self.missing = []  # Initialize list of sound files that could not be loaded
+        self.error = None  # Initialize exception raised by the loading thread (None if loading succeeded)
+        self.loaded = 0  # Set number of assets processed so far
+        self.total = len(SOUND_MANIFEST) + len(FONT_MANIFEST)  # Count assets to process
+        self.thread = threading.Thread(target=self.load, daemon=True)  # Create background loading thread
+
+    def start(self):  # Define method to begin loading
+        self.thread.start()  # Start background loading thread
+
+    def load(self):  # Define method run on the background thread
+        try:  # Begin try block so errors are reported instead of silently ending the thread
+            self.load_assets()  # Load all assets from the manifests
+        except Exception as error:  # Catch any loading error
+            self.error = error  # Store error so main() can re-raise it
+
+    def load_assets(self):  # Define method to load sounds and fonts from the manifests
+        for name, (filename, voices, volume) in SOUND_MANIFEST.items():  # Iterate over sound manifest
+            if pygame.mixer.get_init():  # Check if mixer is available
+                try:  # Begin try block to handle potential file loading errors
+                    self.sounds[name] = pygame.mixer.Sound(os.path.join(ASSET_DIR, filename))  # Load sound from script directory
+                except (FileNotFoundError, pygame.error):  # Catch error if sound file is missing or unreadable
+                    self.missing.append(filename)  # Remember missing file for warning
+            self.loaded += 1  # Count processed asset
+        for name, (family, size, bold) in FONT_MANIFEST.items():  # Iterate over font manifest
+            self.fonts[name] = get_font(family, size, bold)  # Load font through cache
+            self.loaded += 1  # Count processed asset
+
+    def done(self):  # Define method to check if loading has finished
+        return not self.thread.is_alive()  # Return True once background thread has exited
+
+# Show a minimal progress bar (no fonts needed) until background loading finishes
+def show_loading_screen(screen, loader):  # Define function to run loading screen loop
+    clock = pygame.time.Clock()  # Create clock for controlling frame rate
+    bar = pygame.Rect(SCREEN_WIDTH // 4, SCREEN_HEIGHT // 2 - 10, SCREEN_WIDTH // 2, 20)  # Create rectangle for progress bar outline
+    while not loader.done():  # Loop until all assets are loaded
+        for event in pygame.event.get():  # Iterate over all Pygame events
+            if event.type == pygame.QUIT:  # Check if window close button is clicked
+                return False  # Report that the player quit during loading
+        screen.fill(BLACK)  # Clear screen to black
+        pygame.draw.rect(screen, WHITE, bar, 2)  # Draw progress bar outline
+        fill_width = (bar.width - 8) * loader.loaded // loader.total  # Calculate filled width from loading progress
+        pygame.draw.rect(screen, PLAYER_COLOR, (bar.x + 4, bar.y + 4, fill_width, bar.height - 8))  # Draw filled part of progress bar
+        pygame.display.flip()  # Update the screen with progress bar
+        clock.tick(30)  # Limit loading screen to 30 FPS
+    return True  # Report that loading finished
 
 # Player class to manage tank movement, health, lives, and score
 class Player:  # Define Player class for the controllable tank
@@ -78,8 +212,7 @@ class Player:  # Define Player class for the controllable tank
 
     def take_damage(self, damage):  # Define method to apply damage to player
         self.health -= damage  # Reduce health by damage amount
-        if DAMAGE_SOUND:  # Check if damage sound is available
-            DAMAGE_SOUND.play()  # Play damage sound effect
+        AUDIO.trigger("damage", self.rect.centerx)  # Request damage sound effect at this position
         if self.health <= 0:  # Check if health is depleted
             self.lives -= 1  # Decrease lives by 1
             self.health = self.max_health  # Reset health to maximum
@@ -102,8 +235,7 @@ class Projectile:  # Define Projectile class for shots fired
         self.rect = pygame.Rect(x, y, 10, 5)  # Create projectile hitbox as a 10x5 rectangle
         self.vx = direction * 15  # Set horizontal speed based on direction (15 pixels per frame)
         self.damage = damage  # Set damage value for the projectile
-        if SHOOT_SOUND:  # Check if shoot sound is available
-            SHOOT_SOUND.play()  # Play shoot sound effect
+        AUDIO.trigger("shoot", x)  # Request shoot sound effect at this position
 
     def move(self):  # Define method to update projectile position
         self.rect.x += self.vx  # Move projectile horizontally based on velocity
@@ -147,8 +279,7 @@ class Enemy:  # Define Enemy class for opponent tanks
 
     def take_damage(self, damage):  # Define method to apply damage to enemy
         self.health -= damage  # Reduce health by damage amount
-        if DAMAGE_SOUND:  # Check if damage sound is available
-            DAMAGE_SOUND.play()  # Play damage sound effect
+        AUDIO.trigger("damage", self.rect.centerx)  # Request damage sound effect at this position
         return self.health > 0  # Return True if enemy is still alive
 
     def draw(self, screen, camera):  # Define method to draw enemy
@@ -176,8 +307,7 @@ class Collectible:  # Define Collectible class for game power-ups
             player.score += 100  # Add 100 points to player score
         elif self.type == "score":  # Check if collectible is score type
             player.score += 200  # Add 200 points to player score
-        if COLLECT_SOUND:  # Check if collect sound is available
-            COLLECT_SOUND.play()  # Play collect sound effect
+        AUDIO.trigger("collect", self.rect.centerx)  # Request collect sound effect at this position
 
     def draw(self, screen, camera):  # Define method to draw collectible
         rect = camera.apply(self.rect)  # Apply camera offset to collectible position
@@ -221,7 +351,7 @@ def draw_gradient(screen, top_color, bottom_color):  # Define function to draw g
         pygame.draw.line(screen, color, (0, y), (SCREEN_WIDTH, y))  # Draw horizontal line with interpolated color
 
 # Create level with enemies and collectibles
-def create_level(level_num, level_width):  # Define function to create level content
+def create_level(level_num, level_width, rng):  # Define function to create level content using seeded random generator rng
     enemies = []  # Initialize empty list for enemies
     collectibles = []  # Initialize empty list for collectibles
     
@@ -231,39 +361,396 @@ def create_level(level_num, level_width):  # Define function to create level con
         for i in range(num_enemies):  # Iterate to create enemies
             enemies.append(Enemy(500 + i * (level_width // num_enemies), GROUND_HEIGHT - 30))  # Add enemy spaced by level width
             if i < num_collectibles - 1:  # Add collectibles for all but last
-                collectibles.append(Collectible(400 + i * (level_width // num_collectibles), GROUND_HEIGHT - 20, random.choice(["health", "score"])))  # Add random health or score collectible
+                collectibles.append(Collectible(400 + i * (level_width // num_collectibles), GROUND_HEIGHT - 20, rng.choice(["health", "score"])))  # Add random health or score collectible
         collectibles.append(Collectible(800, GROUND_HEIGHT - 20, "life"))  # Add extra life collectible
     elif level_num == 1:  # Check if creating level 2
         num_enemies = 7  # Set number of enemies to 7
         num_collectibles = 7  # Set number of collectibles to 7
         for i in range(num_enemies):  # Iterate to create enemies
             enemies.append(Enemy(600 + i * (level_width // num_enemies), GROUND_HEIGHT - 30))  # Add enemy spaced by level width
-            collectibles.append(Collectible(500 + i * (level_width // num_collectibles), GROUND_HEIGHT - 20, random.choice(["health", "life", "score"])))  # Add random collectible
+            collectibles.append(Collectible(500 + i * (level_width // num_collectibles), GROUND_HEIGHT - 20, rng.choice(["health", "life", "score"])))  # Add random collectible
     elif level_num == 2:  # Check if creating level 3
         num_enemies = 3  # Set number of regular enemies to 3
         num_collectibles = 4  # Set number of collectibles to 4
         enemies.append(Enemy(level_width - 200, GROUND_HEIGHT - 30, is_boss=True))  # Add boss enemy near level end
         for i in range(num_enemies):  # Iterate to create regular enemies
             enemies.append(Enemy(600 + i * (level_width // (num_enemies + 1)), GROUND_HEIGHT - 30))  # Add regular enemy spaced by level width
-            collectibles.append(Collectible(500 + i * (level_width // num_collectibles), GROUND_HEIGHT - 20, random.choice(["health", "life"])))  # Add random health or life collectible
+            collectibles.append(Collectible(500 + i * (level_width // num_collectibles), GROUND_HEIGHT - 20, rng.choice(["health", "life"])))  # Add random health or life collectible
         collectibles.append(Collectible(1000, GROUND_HEIGHT - 20, "life"))  # Add extra life collectible
     
     return enemies, collectibles, level_width  # Return enemies, collectibles, and level width
 
+
+# GameState class holding everything the simulation needs, so it can be stepped, snapshotted and restored
+class GameState:  # Define GameState class for the whole game world
+    def __init__(self, seed):  # Initialize game state with a random seed
+        self.seed = seed  # Store seed so the session can be reproduced
+        self.rng = random.Random(seed)  # Create seeded random generator for all gameplay randomness
+        self.frame = 0  # Set frame counter to 0 (number of simulation steps taken)
+        self.reset()  # Set up level 1
+
+    def reset(self):  # Define method to reset world to the start of level 1
+        self.player = Player(100, GROUND_HEIGHT - 30)  # Create player at starting position
+        self.projectiles = []  # Initialize empty list for player projectiles
+        self.enemy_projectiles = []  # Initialize empty list for enemy projectiles
+        self.current_level = 0  # Set initial level to 0 (level 1)
+        self.enemies, self.collectibles, self.level_width = create_level(self.current_level, LEVEL_WIDTHS[self.current_level], self.rng)  # Create initial level content
+        self.camera = Camera(self.level_width)  # Initialize camera with level width
+        self.game_over = False  # Set initial game over state to False
+        self.win = False  # Set initial win state to False for final congratulation
+        self.level_complete = False  # Set initial level complete state to False
+        self.level_complete_timer = 0  # Initialize frame counter for level complete message
+
+# Pack held key state into a bitmask (one bit per key in HELD_KEYS)
+def encode_keys(keys):  # Define function to encode key state as an integer
+    mask = 0  # Start with no keys held
+    for bit, key in enumerate(HELD_KEYS):  # Iterate over recorded keys
+        if keys[key]:  # Check if key is held
+            mask |= 1 << bit  # Set the key's bit
+    return mask  # Return key bitmask
+
+# Unpack a key bitmask into a lookup usable by Player.move
+def decode_keys(mask):  # Define function to decode key bitmask
+    return {key: bool(mask & (1 << bit)) for bit, key in enumerate(HELD_KEYS)}  # Map each recorded key to its held state
+
+# Advance the simulation by one frame using held keys and KEYDOWN presses
+def step_game(state, keys, pressed):  # Define function to update game state for one frame
+    for key in pressed:  # Iterate over keys pressed this frame
+        if key == pygame.K_r and (state.game_over or state.win):  # Check if 'R' is pressed during game over or final win
+            state.reset()  # Reset world to level 1
+        if key == pygame.K_s and not (state.game_over or state.win or state.level_complete):  # Check if 'S' is pressed and game is active
+            state.projectiles.append(Projectile(state.player.rect.centerx, state.player.rect.centery, 1))  # Add new player projectile
+
+    player = state.player  # Local reference to player
+    if not (state.game_over or state.win or state.level_complete):  # Check if game is active (not game over, won, or level complete)
+        player.move(keys, state.level_width)  # Update player movement based on key input
+        state.camera.update(player)  # Update camera to follow player
+
+        for p in state.projectiles[:]:  # Iterate over copy of player projectiles
+            p.move()  # Move projectile
+            if p.rect.x > state.level_width or p.rect.x < 0:  # Check if projectile is out of level bounds
+                state.projectiles.remove(p)  # Remove projectile from list
+            else:  # Handle projectile collisions
+                for enemy in state.enemies[:]:  # Iterate over copy of enemies
+                    if p.rect.colliderect(enemy.rect):  # Check if projectile hits enemy
+                        if not enemy.take_damage(p.damage):  # Apply damage and check if enemy is defeated
+                            state.enemies.remove(enemy)  # Remove defeated enemy
+                            player.score += 100 if not enemy.is_boss else 500  # Add 100 points for regular, 500 for boss
+                        state.projectiles.remove(p)  # Remove projectile
+                        break  # Exit enemy loop after hit
+
+        for enemy in state.enemies:  # Iterate over enemies
+            enemy.move(player, state.level_width)  # Update enemy movement
+            if state.rng.random() < 0.02:  # Check if enemy should shoot (2% chance per frame)
+                enemy.shoot(state.enemy_projectiles)  # Make enemy shoot
+            if enemy.rect.colliderect(player.rect):  # Check if enemy collides with player
+                if not player.take_damage(10):  # Apply 10 damage to player and check if alive
+                    state.game_over = True  # Set game over state if player dies
+
+        for p in state.enemy_projectiles[:]:  # Iterate over copy of enemy projectiles
+            p.move()  # Move projectile
+            if p.rect.colliderect(player.rect):  # Check if projectile hits player
+                if not player.take_damage(p.damage):  # Apply damage and check if player dies
+                    state.game_over = True  # Set game over state
+                state.enemy_projectiles.remove(p)  # Remove projectile
+            elif p.rect.x > state.level_width or p.rect.x < 0:  # Check if projectile is out of bounds
+                state.enemy_projectiles.remove(p)  # Remove projectile
+
+        for c in state.collectibles[:]:  # Iterate over copy of collectibles
+            if player.rect.colliderect(c.rect):  # Check if player collects item
+                c.apply(player)  # Apply collectible effect to player
+                state.collectibles.remove(c)  # Remove collected item
+
+        if not state.enemies:  # Check if all enemies are defeated
+            if state.current_level < 2:  # Check if not on last level
+                state.level_complete = True  # Set level complete state
+                state.level_complete_timer = 0  # Start counting frames since level completion
+            else:  # Handle last level completion
+                state.win = True  # Trigger final win state
+
+    if state.level_complete:  # Check if level is complete
+        state.level_complete_timer += 1  # Count frames since level completion
+        if state.level_complete_timer > LEVEL_COMPLETE_FRAMES:  # Check if 2 seconds worth of frames have passed
+            state.current_level += 1  # Advance to next level
+            state.enemies, state.collectibles, state.level_width = create_level(state.current_level, LEVEL_WIDTHS[state.current_level], state.rng)  # Create new level content
+            state.camera = Camera(state.level_width)  # Update camera for new level
+            player.rect.x = 100  # Reset player x position
+            player.rect.y = GROUND_HEIGHT - 30  # Reset player y position
+            state.level_complete = False  # Reset level complete state
+            state.level_complete_timer = 0  # Reset level complete timer
+
+    state.frame += 1  # Count simulated frame
+
+# Draw the whole game world and UI for the current state
+def draw_frame(screen, state, font, congrats_font, instruction_texts):  # Define function to render one frame
+    player = state.player  # Local reference to player
+    camera = state.camera  # Local reference to camera
+    draw_gradient(screen, LEVEL_GRADIENTS[state.current_level][0], LEVEL_GRADIENTS[state.current_level][1])  # Draw level background gradient
+
+    pygame.draw.rect(screen, GROUND_COLOR, (0, GROUND_HEIGHT, SCREEN_WIDTH, SCREEN_HEIGHT - GROUND_HEIGHT))  # Draw brown ground rectangle
+    for x in range(0, SCREEN_WIDTH, 20):  # Iterate over screen width in steps of 20
+        pygame.draw.line(screen, (100, 50, 0), (x, GROUND_HEIGHT), (x + 10, SCREEN_HEIGHT), 2)  # Draw diagonal texture lines
+
+    player.draw(screen, camera)  # Draw player tank
+    for p in state.projectiles:  # Iterate over player projectiles
+        p.draw(screen, camera)  # Draw each projectile
+    for p in state.enemy_projectiles:  # Iterate over enemy projectiles
+        p.draw(screen, camera)  # Draw each projectile
+    for enemy in state.enemies:  # Iterate over enemies
+        enemy.draw(screen, camera)  # Draw each enemy
+    for c in state.collectibles:  # Iterate over collectibles
+        c.draw(screen, camera)  # Draw each collectible
+
+    ui_rect = pygame.Rect(10, 10, 200, 100)  # Create rectangle for UI panel
+    pygame.draw.rect(screen, UI_BG_COLOR, ui_rect)  # Draw semi-transparent UI background
+    score_text = font.render(f"Score: {player.score}", True, WHITE)  # Render score text
+    lives_text = font.render(f"Lives: {player.lives}", True, WHITE)  # Render lives text
+    level_text = font.render(f"Level: {state.current_level + 1}", True, WHITE)  # Render level text
+    screen.blit(score_text, (20, 20))  # Draw score text at position (20, 20)
+    screen.blit(lives_text, (20, 50))  # Draw lives text at position (20, 50)
+    screen.blit(level_text, (20, 80))  # Draw level text at position (20, 80)
+
+    instr_rect = pygame.Rect(SCREEN_WIDTH - 210, 10, 200, 120)  # Create rectangle for instruction panel
+    pygame.draw.rect(screen, UI_BG_COLOR, instr_rect)  # Draw semi-transparent instruction background
+    for i, text in enumerate(instruction_texts):  # Iterate over instruction texts
+        screen.blit(text, (SCREEN_WIDTH - 200, 20 + i * 20))  # Draw each instruction line with vertical spacing
+
+    if state.game_over:  # Check if game is over
+        overlay = pygame.Surface((SCREEN_WIDTH, SCREEN_HEIGHT), pygame.SRCALPHA)  # Create semi-transparent overlay surface
+        draw_gradient(overlay, (50, 50, 50, 100), (100, 100, 100, 100))  # Draw gray gradient on overlay
+        screen.blit(overlay, (0, 0))  # Draw overlay on screen
+        result_text = "Game Over! Press R to Restart"  # Set game over message
+        text = font.render(result_text, True, WHITE)  # Render game over text in white
+        shadow = font.render(result_text, True, BLACK)  # Render shadow text in black
+        screen.blit(shadow, (SCREEN_WIDTH // 2 - text.get_width() // 2 + 2, SCREEN_HEIGHT // 2 + 2))  # Draw shadow slightly offset
+        screen.blit(text, (SCREEN_WIDTH // 2 - text.get_width() // 2, SCREEN_HEIGHT // 2))  # Draw game over text centered
+    elif state.win:  # Check if game is won
+        overlay = pygame.Surface((SCREEN_WIDTH, SCREEN_HEIGHT), pygame.SRCALPHA)  # Create semi-transparent overlay surface
+        draw_gradient(overlay, (50, 50, 150, 100), (100, 100, 200, 100))  # Draw blue-tinted gradient on overlay
+        screen.blit(overlay, (0, 0))  # Draw overlay on screen
+        congrats_text = "Congratulations! You've Conquered the Battlefield!"  # Set final congratulation message
+        score_text = f"Final Score: {player.score}"  # Set final score message
+        lives_text = f"Lives Remaining: {player.lives}"  # Set lives remaining message
+        restart_text = "Press R to Restart"  # Set restart prompt
+        text1 = congrats_font.render(congrats_text, True, WHITE)  # Render congratulation text in white (larger font)
+        text2 = font.render(score_text, True, WHITE)  # Render score text in white
+        text3 = font.render(lives_text, True, WHITE)  # Render lives text in white
+        text4 = font.render(restart_text, True, WHITE)  # Render restart text in white
+        shadow1 = congrats_font.render(congrats_text, True, BLACK)  # Render congratulation shadow in black
+        shadow2 = font.render(score_text, True, BLACK)  # Render score shadow in black
+        shadow3 = font.render(lives_text, True, BLACK)  # Render lives shadow in black
+        shadow4 = font.render(restart_text, True, BLACK)  # Render restart shadow in black
+        y_offset = SCREEN_HEIGHT // 2 - 80  # Calculate starting y position for centered text
+        screen.blit(shadow1, (SCREEN_WIDTH // 2 - text1.get_width() // 2 + 2, y_offset + 2))  # Draw congratulation shadow
+        screen.blit(text1, (SCREEN_WIDTH // 2 - text1.get_width() // 2, y_offset))  # Draw congratulation text
+        screen.blit(shadow2, (SCREEN_WIDTH // 2 - text2.get_width() // 2 + 2, y_offset + 40 + 2))  # Draw score shadow
+        screen.blit(text2, (SCREEN_WIDTH // 2 - text2.get_width() // 2, y_offset + 40))  # Draw score text
+        screen.blit(shadow3, (SCREEN_WIDTH // 2 - text3.get_width() // 2 + 2, y_offset + 80 + 2))  # Draw lives shadow
+        screen.blit(text3, (SCREEN_WIDTH // 2 - text3.get_width() // 2, y_offset + 80))  # Draw lives text
+        screen.blit(shadow4, (SCREEN_WIDTH // 2 - text4.get_width() // 2 + 2, y_offset + 120 + 2))  # Draw restart shadow
+        screen.blit(text4, (SCREEN_WIDTH // 2 - text4.get_width() // 2, y_offset + 120))  # Draw restart text
+    elif state.level_complete:  # Check if level is complete
+        overlay = pygame.Surface((SCREEN_WIDTH, SCREEN_HEIGHT), pygame.SRCALPHA)  # Create semi-transparent overlay surface
+        draw_gradient(overlay, (50, 150, 50, 100), (100, 200, 100, 100))  # Draw green-tinted gradient for level complete
+        screen.blit(overlay, (0, 0))  # Draw overlay on screen
+        level_text = f"Level {state.current_level + 1} Complete! Advancing..."  # Set level complete message
+        text = font.render(level_text, True, WHITE)  # Render level complete text in white
+        shadow = font.render(level_text, True, BLACK)  # Render shadow text in black
+        screen.blit(shadow, (SCREEN_WIDTH // 2 - text.get_width() // 2 + 2, SCREEN_HEIGHT // 2 + 2))  # Draw shadow slightly offset
+        screen.blit(text, (SCREEN_WIDTH // 2 - text.get_width() // 2, SCREEN_HEIGHT // 2))  # Draw level complete text centered
+
+# Serialize the plain fields of a game state into a compressed JSON snapshot (no code is stored, unlike pickle)
+def save_snapshot(state):  # Define function to turn a game state into snapshot bytes
+    player = state.player  # Local reference to player
+    data = {  # Build dictionary of plain values describing the world
+        "version": SNAPSHOT_VERSION,  # Store snapshot layout version
+        "seed": state.seed,  # Store session seed
+        "rng": state.rng.getstate(),  # Store random generator state (version, internal state, gauss value)
+        "frame": state.frame,  # Store frame counter
+        "current_level": state.current_level,  # Store current level index
+        "level_width": state.level_width,  # Store current level width
+        "camera_offset": state.camera.offset,  # Store camera offset
+        "game_over": state.game_over,  # Store game over state
+        "win": state.win,  # Store win state
+        "level_complete": state.level_complete,  # Store level complete state
+        "level_complete_timer": state.level_complete_timer,  # Store level complete frame counter
+        "player": [list(player.rect), player.vx, player.vy, player.health, player.lives, player.on_ground, player.score],  # Store player fields
+        "enemies": [[list(e.rect), e.vx, e.health, e.max_health, e.is_boss, e.shoot_timer] for e in state.enemies],  # Store enemy fields
+        "projectiles": [[list(p.rect), p.vx, p.damage] for p in state.projectiles],  # Store player projectile fields
+        "enemy_projectiles": [[list(p.rect), p.vx, p.damage] for p in state.enemy_projectiles],  # Store enemy projectile fields
+        "collectibles": [[list(c.rect), c.type] for c in state.collectibles]  # Store collectible fields
+    }
+    return zlib.compress(json.dumps(data, separators=(",", ":")).encode())  # Encode and compress snapshot
+
+# Rebuild a game state from snapshot bytes made by save_snapshot
+def load_snapshot(payload):  # Define function to turn snapshot bytes back into a game state
+    data = json.loads(zlib.decompress(payload))  # Decompress and decode snapshot
+    if data["version"] != SNAPSHOT_VERSION:  # Check snapshot layout version
+        raise ValueError(f"Unsupported snapshot version {data['version']}")  # Reject snapshots from other versions
+    state = GameState(data["seed"])  # Create game state for the recorded seed
+    version, internal, gauss = data["rng"]  # Unpack random generator state
+    state.rng.setstate((version, tuple(internal), gauss))  # Restore random generator state
+    state.frame = data["frame"]  # Restore frame counter
+    state.current_level = data["current_level"]  # Restore current level index
+    state.level_width = data["level_width"]  # Restore current level width
+    state.camera = Camera(state.level_width)  # Rebuild camera for current level
+    state.camera.offset = data["camera_offset"]  # Restore camera offset
+    state.game_over = data["game_over"]  # Restore game over state
+    state.win = data["win"]  # Restore win state
+    state.level_complete = data["level_complete"]  # Restore level complete state
+    state.level_complete_timer = data["level_complete_timer"]  # Restore level complete frame counter
+
+    rect, vx, vy, health, lives, on_ground, score = data["player"]  # Unpack player fields
+    player = Player(rect[0], rect[1])  # Rebuild player at recorded position
+    player.vx, player.vy, player.health, player.lives, player.on_ground, player.score = vx, vy, health, lives, on_ground, score  # Restore player fields
+    state.player = player  # Store rebuilt player
+
+    state.enemies = []  # Initialize list of rebuilt enemies
+    for rect, vx, health, max_health, is_boss, shoot_timer in data["enemies"]:  # Iterate over recorded enemies
+        enemy = Enemy(rect[0], rect[1], is_boss)  # Rebuild enemy at recorded position
+        enemy.vx, enemy.health, enemy.max_health, enemy.shoot_timer = vx, health, max_health, shoot_timer  # Restore enemy fields
+        state.enemies.append(enemy)  # Add rebuilt enemy
+
+    for key in ("projectiles", "enemy_projectiles"):  # Iterate over both projectile lists
+        projectiles = []  # Initialize list of rebuilt projectiles
+        for rect, vx, damage in data[key]:  # Iterate over recorded projectiles
+            projectile = Projectile(rect[0], rect[1], 1, damage)  # Rebuild projectile at recorded position
+            projectile.vx = vx  # Restore projectile velocity
+            projectiles.append(projectile)  # Add rebuilt projectile
+        setattr(state, key, projectiles)  # Store rebuilt projectile list
+
+    state.collectibles = [Collectible(rect[0], rect[1], type_) for rect, type_ in data["collectibles"]]  # Rebuild collectibles
+    return state  # Return rebuilt game state
+
+# ReplayRecorder class writing seed, per-frame input and periodic snapshots to a binary log
+# Log layout: header (magic, version, seed), then records tagged b"F" (key mask, event count, event indexes)
+# or b"K" (frame number, length, snapshot from save_snapshot)
+class ReplayRecorder:  # Define ReplayRecorder class for capturing a session
+    def __init__(self, path, seed):  # Initialize recorder with output file path and session seed
+        self.file = open(path, "wb")  # Open replay log for binary writing
+        self.file.write(REPLAY_MAGIC + struct.pack("<BI", REPLAY_VERSION, seed))  # Write header with format version and seed
+
+    def record_frame(self, state, mask, pressed):  # Define method to record input for the frame about to be simulated
+        if state.frame % SNAPSHOT_INTERVAL == 0:  # Check if a snapshot is due
+            payload = save_snapshot(state)  # Serialize and compress world state
+            self.file.write(b"K" + struct.pack("<II", state.frame, len(payload)) + payload)  # Write snapshot record
+        codes = bytes(EVENT_KEYS.index(key) for key in pressed)  # Convert pressed keys to compact indexes
+        self.file.write(b"F" + struct.pack("<BB", mask, len(codes)) + codes)  # Write frame record (3 bytes when no keys pressed)
+
+    def close(self):  # Define method to finish recording
+        self.file.close()  # Flush and close replay log
+
+# Replay class loading a replay log and restoring game states from it
+class Replay:  # Define Replay class for playing back a captured session
+    def __init__(self, path):  # Initialize replay by parsing the log at path
+        with open(path, "rb") as f:  # Open replay log for binary reading
+            data = f.read()  # Read whole log into memory
+        if data[:4] != REPLAY_MAGIC:  # Check magic bytes
+            raise ValueError(f"{path} is not a replay file")  # Reject files that are not replay logs
+        version, self.seed = struct.unpack_from("<BI", data, 4)  # Read format version and seed from header
+        if version != REPLAY_VERSION:  # Check format version
+            raise ValueError(f"Unsupported replay version {version}")  # Reject logs from other versions
+        self.frames = []  # Initialize list of (key mask, pressed keys) per frame
+        self.snapshots = {}  # Initialize dictionary of frame number to compressed snapshot
+        pos = 4 + struct.calcsize("<BI")  # Start reading records after header
+        while pos < len(data):  # Iterate over records
+            tag = data[pos:pos + 1]  # Read record tag
+            if tag == b"F" and pos + 3 <= len(data):  # Check for complete frame record header
+                mask, count = struct.unpack_from("<BB", data, pos + 1)  # Read key mask and event count
+                codes = data[pos + 3:pos + 3 + count]  # Read event indexes
+                if len(codes) < count:  # Check for record truncated by an interrupted recording
+                    break  # Stop at last complete frame
+                self.frames.append((mask, [EVENT_KEYS[code] for code in codes]))  # Store frame input
+                pos += 3 + count  # Move to next record
+            elif tag == b"K" and pos + 9 <= len(data):  # Check for complete snapshot record header
+                frame, length = struct.unpack_from("<II", data, pos + 1)  # Read snapshot frame and payload length
+                if pos + 9 + length > len(data):  # Check for record truncated by an interrupted recording
+                    break  # Stop at last complete record
+                self.snapshots[frame] = data[pos + 9:pos + 9 + length]  # Store compressed snapshot
+                pos += 9 + length  # Move to next record
+            else:  # Handle unknown or truncated record
+                break  # Stop reading the log
+
+    def seek(self, frame):  # Define method returning game state at the start of the given frame
+        enabled = AUDIO.enabled  # Remember whether sound is enabled
+        AUDIO.enabled = False  # Mute sound while restoring and stepping to frame
+        frame = max(0, min(frame, len(self.frames)))  # Clamp frame to recorded range
+        start = max((f for f in self.snapshots if f <= frame), default=None)  # Find nearest snapshot at or before frame
+        if start is None:  # Check if no usable snapshot exists
+            state = GameState(self.seed)  # Start fresh game from recorded seed
+        else:  # Handle snapshot restore
+            state = load_snapshot(self.snapshots[start])  # Restore world state from snapshot
+        while state.frame < frame:  # Step forward from snapshot to requested frame
+            mask, pressed = self.frames[state.frame]  # Read recorded input for this frame
+            step_game(state, decode_keys(mask), pressed)  # Simulate frame
+        AUDIO.enabled = enabled  # Restore sound setting
+        return state  # Return positioned game state
+
+# Play back a replay either at max speed without rendering or at normal speed with rendering
+def run_replay(replay, start_frame, fast, screen, font, congrats_font, instruction_texts):  # Define function to run a replay (screen and fonts unused when fast)
+    state = replay.seek(start_frame)  # Restore state at starting frame from nearest snapshot
+    AUDIO.enabled = not fast  # Keep sound muted only for fast playback
+    clock = pygame.time.Clock()  # Create clock for controlling frame rate
+    timings = []  # Initialize list of (frame time, frame number) measurements
+    running = True  # Set playback running state to True
+    while running and state.frame < len(replay.frames):  # Play until recorded input runs out or window is closed
+        if not fast:  # Check if playing with rendering
+            for event in pygame.event.get():  # Iterate over all Pygame events
+                if event.type == pygame.QUIT:  # Check if window close button is clicked
+                    running = False  # Stop playback after this frame
+        frame = state.frame  # Remember frame number being simulated
+        start = time.perf_counter()  # Record start time of frame
+        mask, pressed = replay.frames[frame]  # Read recorded input for frame
+        step_game(state, decode_keys(mask), pressed)  # Simulate frame
+        if not fast:  # Check if playing with rendering
+            AUDIO.flush(state.camera)  # Play sounds triggered this frame
+            draw_frame(screen, state, font, congrats_font, instruction_texts)  # Render frame
+        timings.append((time.perf_counter() - start, frame))  # Store time taken for frame
+        if not fast:  # Check if playing with rendering
+            pygame.display.flip()  # Update the screen with all drawn elements
+            clock.tick(60)  # Limit frame rate to 60 FPS
+    AUDIO.enabled = True  # Restore sound effects
+    print(f"Replayed {len(timings)} frames (seed {replay.seed})")  # Print replay summary
+    for duration, frame in sorted(timings, reverse=True)[:10]:  # Iterate over the 10 slowest frames
+        print(f"  frame {frame}: {duration * 1000:.2f} ms")  # Print frame number and frame time
+
+# Parse a --seed value, which must fit the unsigned 32-bit field in the replay header
+def seed_value(text):  # Define argparse type for seeds
+    seed = int(text)  # Convert text to integer (argparse reports ValueError as invalid value)
+    if not 0 <= seed < 2 ** 32:  # Check seed fits in 32 unsigned bits
+        raise argparse.ArgumentTypeError(f"seed must be between 0 and {2 ** 32 - 1}")  # Reject out-of-range seed
+    return seed  # Return valid seed
+
 # Main game function
-def main():  # Define main game function
-    player = Player(100, GROUND_HEIGHT - 30)  # Create player at starting position
-    projectiles = []  # Initialize empty list for player projectiles
-    enemy_projectiles = []  # Initialize empty list for enemy projectiles
-    current_level = 0  # Set initial level to 0 (level 1)
-    enemies, collectibles, level_width = create_level(current_level, LEVEL_WIDTHS[current_level])  # Create initial level content
-    camera = Camera(level_width)  # Initialize camera with level width
-    game_over = False  # Set initial game over state to False
-    win = False  # Set initial win state to False for final congratulation
-    level_complete = False  # Set initial level complete state to False
-    level_complete_timer = 0  # Initialize timer for level complete message
-    font = pygame.font.SysFont("arial", 24, bold=True)  # Create font for UI text (24pt, bold)
-    congrats_font = pygame.font.SysFont("arial", 36, bold=True)  # Create larger font for final congratulation (36pt, bold)
+def main(argv=None):  # Define main game function (argv for command-line options)
+    parser = argparse.ArgumentParser(description="Tank Battle: Side-Scroller")  # Create command-line parser
+    parser.add_argument("--seed", type=seed_value, help="random seed for the session (default: random)")  # Add option for fixed seed
+    parser.add_argument("--record", metavar="FILE", help="record seed and input to a replay log")  # Add option to record a session
+    parser.add_argument("--replay", metavar="FILE", help="play back a replay log")  # Add option to play back a session
+    parser.add_argument("--fast", action="store_true", help="replay at max speed without rendering")  # Add option for headless fast replay
+    parser.add_argument("--seek", type=int, default=0, metavar="FRAME", help="start replay at this frame")  # Add option to seek into replay
+    args = parser.parse_args(argv)  # Parse command-line options
+
+    if args.replay and args.fast:  # Check if a fast replay was requested
+        run_replay(Replay(args.replay), args.seek, True, None, None, None, None)  # Simulate without window, sound or fonts
+        return  # Exit the main function
+
+    screen = init_engine()  # Start Pygame and open game window
+    loader = AssetLoader()  # Create asset loader
+    loader.start()  # Load sounds and fonts in the background
+    if not show_loading_screen(screen, loader):  # Show loading screen and check if player quit
+        loader.thread.join()  # Wait for loading thread before shutting down Pygame
+        shutdown_engine()  # Quit Pygame
+        return  # Exit the main function
+    if loader.error:  # Check if loading failed
+        shutdown_engine()  # Quit Pygame
+        raise loader.error  # Report the error from the loading thread
+    if loader.missing:  # Check if any sound files were not found
+        print(f"Sound files not found: {', '.join(loader.missing)}. Please add them to {ASSET_DIR}.")  # Print warning if sound files are not found
+    for name, sound in loader.sounds.items():  # Iterate over loaded sounds
+        AUDIO.add_category(name, sound, SOUND_MANIFEST[name][1], SOUND_MANIFEST[name][2])  # Reserve channel group for each sound
+    font = loader.fonts["ui"]  # Get font for UI text
+    congrats_font = loader.fonts["congrats"]  # Get larger font for final congratulation
     clock = pygame.time.Clock()  # Create clock for controlling frame rate
 
     instruction_texts = [  # Create list of instruction text surfaces
@@ -274,156 +761,32 @@ def main():  # Define main game function
         font.render("R: Restart", True, WHITE)  # Render "R: Restart" text in white
     ]
 
+    if args.replay:  # Check if a replay was requested
+        run_replay(Replay(args.replay), args.seek, False, screen, font, congrats_font, instruction_texts)  # Play back the replay log with rendering
+        shutdown_engine()  # Quit Pygame
+        return  # Exit the main function
+
+    seed = args.seed if args.seed is not None else random.randrange(2 ** 32)  # Use given seed or pick a random one
+    state = GameState(seed)  # Create game state from seed
+    recorder = ReplayRecorder(args.record, seed) if args.record else None  # Start recorder if requested
+
     while True:  # Start infinite game loop
+        pressed = []  # Initialize list of recorded keys pressed this frame
         for event in pygame.event.get():  # Iterate over all Pygame events
             if event.type == pygame.QUIT:  # Check if window close button is clicked
-                pygame.quit()  # Quit Pygame
+                if recorder:  # Check if recording
+                    recorder.close()  # Finish replay log
+                shutdown_engine()  # Quit Pygame
                 return  # Exit the main function
-            if event.type == pygame.KEYDOWN:  # Check if a key is pressed
-                if event.key == pygame.K_r and (game_over or win):  # Check if 'R' is pressed during game over or final win
-                    player = Player(100, GROUND_HEIGHT - 30)  # Reset player to starting position
-                    current_level = 0  # Reset to level 1
-                    enemies, collectibles, level_width = create_level(current_level, LEVEL_WIDTHS[current_level])  # Recreate level content
-                    camera = Camera(level_width)  # Reset camera with new level width
-                    projectiles.clear()  # Clear all player projectiles
-                    enemy_projectiles.clear()  # Clear all enemy projectiles
-                    game_over = False  # Reset game over state
-                    win = False  # Reset final win state
-                    level_complete = False  # Reset level complete state
-                    level_complete_timer = 0  # Reset level complete timer
-                if event.key == pygame.K_s and not (game_over or win or level_complete):  # Check if 'S' is pressed and game is active
-                    projectiles.append(Projectile(player.rect.centerx, player.rect.centery, 1))  # Add new player projectile
-
-        if not (game_over or win or level_complete):  # Check if game is active (not game over, won, or level complete)
-            keys = pygame.key.get_pressed()  # Get current state of all keyboard keys
-            player.move(keys, level_width)  # Update player movement based on key input
-            camera.update(player)  # Update camera to follow player
-
-            for p in projectiles[:]:  # Iterate over copy of player projectiles
-                p.move()  # Move projectile
-                if p.rect.x > level_width or p.rect.x < 0:  # Check if projectile is out of level bounds
-                    projectiles.remove(p)  # Remove projectile from list
-                else:  # Handle projectile collisions
-                    for enemy in enemies[:]:  # Iterate over copy of enemies
-                        if p.rect.colliderect(enemy.rect):  # Check if projectile hits enemy
-                            if not enemy.take_damage(p.damage):  # Apply damage and check if enemy is defeated
-                                enemies.remove(enemy)  # Remove defeated enemy
-                                player.score += 100 if not enemy.is_boss else 500  # Add 100 points for regular, 500 for boss
-                            projectiles.remove(p)  # Remove projectile
-                            break  # Exit enemy loop after hit
-
-            for enemy in enemies:  # Iterate over enemies
-                enemy.move(player, level_width)  # Update enemy movement
-                if random.random() < 0.02:  # Check if enemy should shoot (2% chance per frame)
-                    enemy.shoot(enemy_projectiles)  # Make enemy shoot
-                if enemy.rect.colliderect(player.rect):  # Check if enemy collides with player
-                    if not player.take_damage(10):  # Apply 10 damage to player and check if alive
-                        game_over = True  # Set game over state if player dies
-
-            for p in enemy_projectiles[:]:  # Iterate over copy of enemy projectiles
-                p.move()  # Move projectile
-                if p.rect.colliderect(player.rect):  # Check if projectile hits player
-                    if not player.take_damage(p.damage):  # Apply damage and check if player dies
-                        game_over = True  # Set game over state
-                    enemy_projectiles.remove(p)  # Remove projectile
-                elif p.rect.x > level_width or p.rect.x < 0:  # Check if projectile is out of bounds
-                    enemy_projectiles.remove(p)  # Remove projectile
-
-            for c in collectibles[:]:  # Iterate over copy of collectibles
-                if player.rect.colliderect(c.rect):  # Check if player collects item
-                    c.apply(player)  # Apply collectible effect to player
-                    collectibles.remove(c)  # Remove collected item
-
-            if not enemies:  # Check if all enemies are defeated
-                if current_level < 2:  # Check if not on last level
-                    level_complete = True  # Set level complete state
-                    level_complete_timer = pygame.time.get_ticks()  # Record time of level completion
-                else:  # Handle last level completion
-                    win = True  # Trigger final win state
-
-        if level_complete:  # Check if level is complete
-            if pygame.time.get_ticks() - level_complete_timer > 2000:  # Check if 2 seconds have passed
-                current_level += 1  # Advance to next level
-                enemies, collectibles, level_width = create_level(current_level, LEVEL_WIDTHS[current_level])  # Create new level content
-                camera = Camera(level_width)  # Update camera for new level
-                player.rect.x = 100  # Reset player x position
-                player.rect.y = GROUND_HEIGHT - 30  # Reset player y position
-                level_complete = False  # Reset level complete state
-                level_complete_timer = 0  # Reset level complete timer
-
-        draw_gradient(screen, LEVEL_GRADIENTS[current_level][0], LEVEL_GRADIENTS[current_level][1])  # Draw level background gradient
-        
-        pygame.draw.rect(screen, GROUND_COLOR, (0, GROUND_HEIGHT, SCREEN_WIDTH, SCREEN_HEIGHT - GROUND_HEIGHT))  # Draw brown ground rectangle
-        for x in range(0, SCREEN_WIDTH, 20):  # Iterate over screen width in steps of 20
-            pygame.draw.line(screen, (100, 50, 0), (x, GROUND_HEIGHT), (x + 10, SCREEN_HEIGHT), 2)  # Draw diagonal texture lines
-
-        player.draw(screen, camera)  # Draw player tank
-        for p in projectiles:  # Iterate over player projectiles
-            p.draw(screen, camera)  # Draw each projectile
-        for p in enemy_projectiles:  # Iterate over enemy projectiles
-            p.draw(screen, camera)  # Draw each projectile
-        for enemy in enemies:  # Iterate over enemies
-            enemy.draw(screen, camera)  # Draw each enemy
-        for c in collectibles:  # Iterate over collectibles
-            c.draw(screen, camera)  # Draw each collectible
-
-        ui_rect = pygame.Rect(10, 10, 200, 100)  # Create rectangle for UI panel
-        pygame.draw.rect(screen, UI_BG_COLOR, ui_rect)  # Draw semi-transparent UI background
-        score_text = font.render(f"Score: {player.score}", True, WHITE)  # Render score text
-        lives_text = font.render(f"Lives: {player.lives}", True, WHITE)  # Render lives text
-        level_text = font.render(f"Level: {current_level + 1}", True, WHITE)  # Render level text
-        screen.blit(score_text, (20, 20))  # Draw score text at position (20, 20)
-        screen.blit(lives_text, (20, 50))  # Draw lives text at position (20, 50)
-        screen.blit(level_text, (20, 80))  # Draw level text at position (20, 80)
-
-        instr_rect = pygame.Rect(SCREEN_WIDTH - 210, 10, 200, 120)  # Create rectangle for instruction panel
-        pygame.draw.rect(screen, UI_BG_COLOR, instr_rect)  # Draw semi-transparent instruction background
-        for i, text in enumerate(instruction_texts):  # Iterate over instruction texts
-            screen.blit(text, (SCREEN_WIDTH - 200, 20 + i * 20))  # Draw each instruction line with vertical spacing
-
-        if game_over:  # Check if game is over
-            overlay = pygame.Surface((SCREEN_WIDTH, SCREEN_HEIGHT), pygame.SRCALPHA)  # Create semi-transparent overlay surface
-            draw_gradient(overlay, (50, 50, 50, 100), (100, 100, 100, 100))  # Draw gray gradient on overlay
-            screen.blit(overlay, (0, 0))  # Draw overlay on screen
-            result_text = "Game Over! Press R to Restart"  # Set game over message
-            text = font.render(result_text, True, WHITE)  # Render game over text in white
-            shadow = font.render(result_text, True, BLACK)  # Render shadow text in black
-            screen.blit(shadow, (SCREEN_WIDTH // 2 - text.get_width() // 2 + 2, SCREEN_HEIGHT // 2 + 2))  # Draw shadow slightly offset
-            screen.blit(text, (SCREEN_WIDTH // 2 - text.get_width() // 2, SCREEN_HEIGHT // 2))  # Draw game over text centered
-        elif win:  # Check if game is won
-            overlay = pygame.Surface((SCREEN_WIDTH, SCREEN_HEIGHT), pygame.SRCALPHA)  # Create semi-transparent overlay surface
-            draw_gradient(overlay, (50, 50, 150, 100), (100, 100, 200, 100))  # Draw blue-tinted gradient on overlay
-            screen.blit(overlay, (0, 0))  # Draw overlay on screen
-            congrats_text = "Congratulations! You've Conquered the Battlefield!"  # Set final congratulation message
-            score_text = f"Final Score: {player.score}"  # Set final score message
-            lives_text = f"Lives Remaining: {player.lives}"  # Set lives remaining message
-            restart_text = "Press R to Restart"  # Set restart prompt
-            text1 = congrats_font.render(congrats_text, True, WHITE)  # Render congratulation text in white (larger font)
-            text2 = font.render(score_text, True, WHITE)  # Render score text in white
-            text3 = font.render(lives_text, True, WHITE)  # Render lives text in white
-            text4 = font.render(restart_text, True, WHITE)  # Render restart text in white
-            shadow1 = congrats_font.render(congrats_text, True, BLACK)  # Render congratulation shadow in black
-            shadow2 = font.render(score_text, True, BLACK)  # Render score shadow in black
-            shadow3 = font.render(lives_text, True, BLACK)  # Render lives shadow in black
-            shadow4 = font.render(restart_text, True, BLACK)  # Render restart shadow in black
-            y_offset = SCREEN_HEIGHT // 2 - 80  # Calculate starting y position for centered text
-            screen.blit(shadow1, (SCREEN_WIDTH // 2 - text1.get_width() // 2 + 2, y_offset + 2))  # Draw congratulation shadow
-            screen.blit(text1, (SCREEN_WIDTH // 2 - text1.get_width() // 2, y_offset))  # Draw congratulation text
-            screen.blit(shadow2, (SCREEN_WIDTH // 2 - text2.get_width() // 2 + 2, y_offset + 40 + 2))  # Draw score shadow
-            screen.blit(text2, (SCREEN_WIDTH // 2 - text2.get_width() // 2, y_offset + 40))  # Draw score text
-            screen.blit(shadow3, (SCREEN_WIDTH // 2 - text3.get_width() // 2 + 2, y_offset + 80 + 2))  # Draw lives shadow
-            screen.blit(text3, (SCREEN_WIDTH // 2 - text3.get_width() // 2, y_offset + 80))  # Draw lives text
-            screen.blit(shadow4, (SCREEN_WIDTH // 2 - text4.get_width() // 2 + 2, y_offset + 120 + 2))  # Draw restart shadow
-            screen.blit(text4, (SCREEN_WIDTH // 2 - text4.get_width() // 2, y_offset + 120))  # Draw restart text
-        elif level_complete:  # Check if level is complete
-            overlay = pygame.Surface((SCREEN_WIDTH, SCREEN_HEIGHT), pygame.SRCALPHA)  # Create semi-transparent overlay surface
-            draw_gradient(overlay, (50, 150, 50, 100), (100, 200, 100, 100))  # Draw green-tinted gradient for level complete
-            screen.blit(overlay, (0, 0))  # Draw overlay on screen
-            level_text = f"Level {current_level + 1} Complete! Advancing..."  # Set level complete message
-            text = font.render(level_text, True, WHITE)  # Render level complete text in white
-            shadow = font.render(level_text, True, BLACK)  # Render shadow text in black
-            screen.blit(shadow, (SCREEN_WIDTH // 2 - text.get_width() // 2 + 2, SCREEN_HEIGHT // 2 + 2))  # Draw shadow slightly offset
-            screen.blit(text, (SCREEN_WIDTH // 2 - text.get_width() // 2, SCREEN_HEIGHT // 2))  # Draw level complete text centered
+            if event.type == pygame.KEYDOWN and event.key in EVENT_KEYS:  # Check if a recorded key is pressed
+                pressed.append(event.key)  # Store key press for this frame
+
+        mask = encode_keys(pygame.key.get_pressed())  # Get current state of movement keys as a bitmask
+        if recorder:  # Check if recording
+            recorder.record_frame(state, mask, pressed)  # Record input (and snapshot) for this frame
+        step_game(state, decode_keys(mask), pressed)  # Update game state for this frame
+        AUDIO.flush(state.camera)  # Play sounds triggered this frame
+        draw_frame(screen, state, font, congrats_font, instruction_texts)  # Render game state
 
         pygame.display.flip()  # Update the screen with all drawn elements
         clock.tick(60)  # Limit frame rate to 60 FPS